@@ -4,12 +4,37 @@ Provides functionality for running experiments, assigning users to groups,
 and analyzing results.
 """
 
-import random
+import copy
+import logging
+import time
+import weakref
+
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument, UpdateMany, UpdateOne
 from pymongo.collection import Collection
 
+from mongo_common import (
+    GROUP_CONTROL, GROUP_INDEX, GROUP_TREATMENT, META_COLLECTION,
+    current_epoch, ensure_indexes, get_default_client
+)
+
+logger = logging.getLogger(__name__)
+
+# Compound index backing the eligibility queries
+_ELIGIBILITY_INDEX = [("createdAt", 1), ("admissionsQuiz", 1)]
+
+# Number of documents fetched per round trip when streaming ids
+_ID_BATCH_SIZE = 1000
+
+# Seconds a database's collection list is reused before being refetched
+_COLLECTIONS_TTL = 30
+
+# Seconds experiment statistics are reused before being recomputed, so that
+# quiz completions written elsewhere show up
+_STATS_TTL = 30
+
 
 class Reset:
     """Class for resetting experiment data in MongoDB."""
@@ -23,12 +48,18 @@ class Reset:
             MongoDB client instance, by default None
         """
         if client is None:
-            self.client = MongoClient(host='localhost', port=27017)
+            self.client = get_default_client()
         else:
             self.client = client
+
+        # Collection names per database, stored as (fetch time, names)
+        self._collections_cache = {}
             
     def reset_database(self, db_name="online_course"):
-        """Reset the database by removing experiment fields.
+        """Reset the database by starting a new experiment epoch.
+
+        Documents are left untouched; bumping each collection's epoch makes
+        every existing assignment stale at once.
         
         Parameters
         ----------
@@ -38,59 +69,105 @@ class Reset:
         Returns
         -------
         dict
-            Dictionary summarizing reset results
+            Dictionary mapping collection names to ``{"epoch": new_epoch}``.
+            Before epoch-based resets this held ``{"matched", "modified"}``
+            counts of the cleared documents.
         """
-        print(f"Client type: {type(self.client)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Client type: %s", type(self.client))
         
         if isinstance(self.client, Collection):
             # Handle the case when client is a Collection
             collection = self.client
-            update_result = collection.update_many(
-                {"inExperiment": True},
-                {"$unset": {"inExperiment": "", "group": ""}}
+            meta = collection.database[META_COLLECTION].find_one_and_update(
+                {"_id": collection.name},
+                {"$inc": {"epoch": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
             )
-            return {collection.name: {
-                "matched": update_result.matched_count,
-                "modified": update_result.modified_count
-            }}
+            return {collection.name: {"epoch": meta["epoch"]}}
 
         db = self.client[db_name]
-        results = {}
-        
-        for collection_name in db.list_collection_names():
-            collection = db[collection_name]
-            update_result = collection.update_many(
-                {"inExperiment": True},
-                {"$unset": {"inExperiment": "", "group": ""}}
+        meta = db[META_COLLECTION]
+        collection_names = self._get_collection_names(db)
+        if not collection_names:
+            return {}
+
+        # Bump every collection's epoch in one batched command
+        try:
+            meta.bulk_write(
+                [
+                    UpdateOne({"_id": name}, {"$inc": {"epoch": 1}}, upsert=True)
+                    for name in collection_names
+                ],
+                ordered=False
             )
-            results[collection_name] = {
-                "matched": update_result.matched_count,
-                "modified": update_result.modified_count
+            results = {
+                doc["_id"]: {"epoch": doc["epoch"]}
+                for doc in meta.find({"_id": {"$in": collection_names}})
             }
+        except Exception:
+            self._collections_cache.pop(db_name, None)
+            raise
         
         return results
+
+    def _get_collection_names(self, db):
+        """Return the experiment collections of a database, cached briefly.
+
+        Parameters
+        ----------
+        db : pymongo.database.Database
+
+        Returns
+        -------
+        list
+            Collection names, excluding the epoch collection
+        """
+        cached = self._collections_cache.get(db.name)
+        if cached is not None and time.monotonic() - cached[0] < _COLLECTIONS_TTL:
+            return cached[1]
+
+        collection_names = [
+            name for name in db.list_collection_names() if name != META_COLLECTION
+        ]
+        self._collections_cache[db.name] = (time.monotonic(), collection_names)
+        return collection_names
     
 
 class Experiment:
     """Class for running A/B test experiments."""
+
+    # Write version per client and collection, bumped whenever an experiment
+    # mutates the collection
+    _write_versions = weakref.WeakKeyDictionary()
+    # Latest statistics per client and collection, stored as
+    # (fetch time, write version, stats)
+    _stats_cache = weakref.WeakKeyDictionary()
     
     def __init__(self, repo=None, db="online_course", collection="applicants"):
         self.db_name = db
         self.collection_name = collection
+        self._reset_tool = None
         
-        print(f"Input repo type: {type(repo)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Input repo type: %s", type(repo))
         
         # Check if repo is None or a MongoClient instance
         if repo is None or isinstance(repo, MongoClient):
             # Use the repo directly as the client
-            self.client = repo if repo is not None else MongoClient(host='localhost', port=27017)
+            self.client = repo if repo is not None else get_default_client()
             self.collection = self.client[db][collection]
         else:
             self.collection = repo.collection
             self.client = self.collection.database.client
+
+        # Support the per-day eligibility queries and the group statistics
+        ensure_indexes(self.collection, [_ELIGIBILITY_INDEX, GROUP_INDEX])
         
-        print(f"Final client type: {type(self.client)}")
-        print(f"Final collection type: {type(self.collection)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Final client type: %s", type(self.client))
+            logger.debug("Final collection type: %s", type(self.collection))
     
     def reset_experiment(self):
         """Reset experimental data in the collection.
@@ -98,11 +175,14 @@ class Experiment:
         Returns
         -------
         dict
-            Dictionary containing reset results
+            ``{"epoch": new_epoch}`` for the collection. Before epoch-based
+            resets this held ``{"matched", "modified"}`` counts.
         """
-        reset_tool = Reset(self.client)
-        result = reset_tool.reset_database(self.db_name)
-        return result.get(self.collection_name, {"matched": 0, "modified": 0})
+        if self._reset_tool is None:
+            self._reset_tool = Reset(self.collection)
+        result = self._reset_tool.reset_database(self.db_name)
+        self._bump_write_version()
+        return result[self.collection.name]
     
     def run_experiment(self, days=7, assignment=True, seed=42):
         """Run an A/B test experiment over a specified number of days.
@@ -114,45 +194,27 @@ class Experiment:
         assignment : bool, optional
             Whether to assign users to groups, by default True
         seed : int, optional
-            Random seed for group assignment, by default 42
+            Seed for group assignment, by default 42
             
         Returns
         -------
         dict
-            Dictionary with experiment results
+            Dictionary with experiment results. ``daily_results`` is a
+            pd.DataFrame with one row per day of the experiment.
         """
-        if assignment:
-            # Reset random seed for consistent assignment
-            random.seed(seed)
-        
         # Calculate date range for experiment
         end_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         start_date = end_date - timedelta(days=days)
         
-        # Dictionary to store daily results
-        daily_results = {}
-        
-        # Run experiment for each day in range
-        current_date = start_date
-        while current_date < end_date:
-            date_str = current_date.strftime("%Y-%m-%d")
-            
-            if assignment:
-                # Assign users to groups
-                if hasattr(self, 'repo') and hasattr(self.repo, 'assign_to_groups'):
-                    result = self.repo.assign_to_groups(date_str)
-                else:
-                    # Create our own assignment logic
-                    result = self._assign_groups_for_date(date_str)
-            else:
-                # Just count users without assignment
-                result = self._count_users_for_date(date_str)
-                
-            daily_results[date_str] = result
-            current_date += timedelta(days=1)
-                
+        if assignment:
+            # Assign all days in the range with one streamed read and one write
+            daily_results = self._assign_groups_for_range(start_date, end_date, seed)
+        else:
+            # Just count users without assignment, in a single aggregation
+            daily_results = self._count_users_for_range(start_date, end_date)
+
         # Calculate overall experiment results
-        total_assigned = sum(day.get('n', 0) for day in daily_results.values())
+        total_assigned = int(daily_results["n"].sum())
         
         # Get final statistics on experiment groups
         stats = self._calculate_experiment_stats()
@@ -164,143 +226,207 @@ class Experiment:
             "statistics": stats
         }
     
-    def _assign_groups_for_date(self, date_string):
-        """Assign users created on a specific date to experiment groups.
-        
+    def _assign_groups_for_range(self, start_date, end_date, seed=42):
+        """Assign users created in a date range to experiment groups.
+
+        Eligible users for the whole range are streamed in one query,
+        bucketed by day, shuffled per day and written back in one bulk write.
+        Each day is shuffled with its own generator seeded from ``seed`` and
+        the date, so a day's split does not depend on the rest of the range.
+
         Parameters
         ----------
-        date_string : str
-            Date string in format YYYY-MM-DD
-            
+        start_date : datetime
+            First day of the range (inclusive)
+        end_date : datetime
+            Last day of the range (exclusive)
+        seed : int, optional
+            Random seed for group assignment, by default 42
+
         Returns
         -------
-        dict
-            Dictionary with assignment results
+        pd.DataFrame
+            Assignment counts with one row per day, indexed by date. ``n``
+            and ``n_modified`` count the users each day's updates match and
+            change.
         """
-        # Convert string to datetime
-        start_date = datetime.strptime(date_string, "%Y-%m-%d")
-        end_date = start_date + timedelta(days=1)
-        
-        # Find applicable users
+        days_index = pd.date_range(start_date, end_date, freq="D", inclusive="left")
+        daily_results = pd.DataFrame(
+            0,
+            index=days_index,
+            columns=["n", "n_modified", "control_size", "treatment_size"],
+            dtype="int64"
+        )
+
+        # Stream applicable users for the whole range and bucket them by day
         query = {
             "createdAt": {"$gte": start_date, "$lt": end_date},
             "admissionsQuiz": "incomplete"
         }
-        users = list(self.collection.find(query))
-        
-        # Shuffle users for random assignment
-        random.shuffle(users)
-        
-        # Split users into control and treatment groups
-        midpoint = len(users) // 2
-        
-        # Assign control group
-        control_group = users[:midpoint]
-        for user in control_group:
-            user['inExperiment'] = True
-            user['group'] = "No email (control)"
-            
-        # Assign treatment group
-        treatment_group = users[midpoint:]
-        for user in treatment_group:
-            user['inExperiment'] = True
-            user['group'] = "email (treatment)"
-            
-        # Update users in database
-        modified_count = 0
-        matched_count = 0
-        
-        all_users = control_group + treatment_group
-        for user in all_users:
-            result = self.collection.update_one(
-                {"_id": user["_id"]},
-                {"$set": {
-                    "inExperiment": user["inExperiment"],
-                    "group": user["group"]
-                }}
-            )
-            matched_count += result.matched_count
-            modified_count += result.modified_count
-            
-        return {
-            "n": matched_count,
-            "n_modified": modified_count,
-            "control_size": len(control_group),
-            "treatment_size": len(treatment_group)
-        }
-    
-    def _count_users_for_date(self, date_string):
-        """Count users created on a specific date without assigning groups.
-        
+        projection = {"_id": 1, "createdAt": 1, "inExperiment": 1, "group": 1}
+        cursor = (
+            self.collection.find(query, projection)
+            .sort("createdAt", 1)
+            .hint(_ELIGIBILITY_INDEX)
+            .batch_size(_ID_BATCH_SIZE)
+        )
+        users_by_day = {}
+        for user in cursor:
+            day = user["createdAt"].replace(hour=0, minute=0, second=0, microsecond=0)
+            users_by_day.setdefault(day, []).append(user)
+
+        # Shuffle and split each day's users
+        epoch = current_epoch(self.collection)
+        ops = []
+        for day in days_index:
+            users = users_by_day.get(day.to_pydatetime(), [])
+            rng = np.random.default_rng(seed + day.toordinal())
+            order = rng.permutation(len(users))
+            midpoint = len(users) // 2
+
+            n_modified = 0
+            for code, positions in (
+                (GROUP_CONTROL, order[:midpoint]), (GROUP_TREATMENT, order[midpoint:])
+            ):
+                group_users = [users[i] for i in positions]
+                if not group_users:
+                    continue
+                ops.append(UpdateMany(
+                    {"_id": {"$in": [user["_id"] for user in group_users]}},
+                    {"$set": {"inExperiment": epoch, "group": code}}
+                ))
+                # Users already in this group of this epoch are left unchanged
+                n_modified += sum(
+                    user.get("inExperiment") != epoch or user.get("group") != code
+                    for user in group_users
+                )
+
+            daily_results.loc[day] = [
+                len(users), n_modified, midpoint, len(users) - midpoint
+            ]
+
+        # Update users in database with a single batched command; pymongo
+        # splits it into batches under the server's size limits
+        if ops:
+            result = self.collection.bulk_write(ops, ordered=False)
+            self._bump_write_version()
+            if result.matched_count != daily_results["n"].sum():
+                logger.warning(
+                    "Matched %d of %d users; some were removed during assignment",
+                    result.matched_count, daily_results["n"].sum()
+                )
+
+        return daily_results
+
+    def _count_users_for_range(self, start_date, end_date):
+        """Count users created in a date range without assigning groups.
+
         Parameters
         ----------
-        date_string : str
-            Date string in format YYYY-MM-DD
-            
+        start_date : datetime
+            First day of the range (inclusive)
+        end_date : datetime
+            Last day of the range (exclusive)
+
         Returns
         -------
-        dict
-            Dictionary with user counts
+        pd.DataFrame
+            User counts with one row per day, indexed by date
         """
-        # Convert string to datetime
-        start_date = datetime.strptime(date_string, "%Y-%m-%d")
-        end_date = start_date + timedelta(days=1)
-        
-        # Count applicable users
-        query = {
-            "createdAt": {"$gte": start_date, "$lt": end_date},
-            "admissionsQuiz": "incomplete"
-        }
-        count = self.collection.count_documents(query)
-        
-        return {"count": count}
+        days_index = pd.date_range(start_date, end_date, freq="D", inclusive="left")
+        daily_results = pd.DataFrame(0, index=days_index, columns=["n"], dtype="int64")
+
+        # Count applicable users per day
+        result = self.collection.aggregate([
+            {
+                "$match": {
+                    "createdAt": {"$gte": start_date, "$lt": end_date},
+                    "admissionsQuiz": "incomplete"
+                }
+            },
+            {
+                "$group": {
+                    "_id": {"$dateTrunc": {"date": "$createdAt", "unit": "day"}},
+                    "count": {"$sum": 1}
+                }
+            },
+            {"$sort": {"_id": 1}}
+        ])
+        counts = {doc["_id"]: doc["count"] for doc in result}
+        daily_results["n"] = [counts.get(day, 0) for day in days_index]
+
+        return daily_results
+
+    def _bump_write_version(self):
+        """Mark cached statistics for this collection as stale."""
+        versions = self._write_versions.setdefault(self.client, {})
+        name = self.collection.full_name
+        versions[name] = versions.get(name, 0) + 1
     
     def _calculate_experiment_stats(self):
         """Calculate statistics for the current experiment.
+
+        Results are cached per client and collection until the next
+        assignment or reset made through this class, or for ``_STATS_TTL``
+        seconds, whichever comes first.
         
         Returns
         -------
         dict
             Dictionary with experiment statistics
         """
-        # Count users in each group
-        control_count = self.collection.count_documents({
-            "inExperiment": True,
-            "group": "No email (control)"
-        })
-        
-        treatment_count = self.collection.count_documents({
-            "inExperiment": True,
-            "group": "email (treatment)"
-        })
-        
-        # Count completed quizzes in each group
-        control_completed = self.collection.count_documents({
-            "inExperiment": True,
-            "group": "No email (control)",
-            "admissionsQuiz": "complete"
-        })
-        
-        treatment_completed = self.collection.count_documents({
-            "inExperiment": True,
-            "group": "email (treatment)",
-            "admissionsQuiz": "complete"
-        })
-        
-        # Calculate completion rates
-        control_rate = control_completed / control_count if control_count > 0 else 0
-        treatment_rate = treatment_completed / treatment_count if treatment_count > 0 else 0
-        
-        return {
-            "control_group": {
-                "total": control_count,
-                "completed": control_completed,
-                "completion_rate": control_rate
-            },
-            "treatment_group": {
-                "total": treatment_count,
-                "completed": treatment_completed,
-                "completion_rate": treatment_rate
+        # Reuse recent statistics if nothing has been written since
+        name = self.collection.full_name
+        version = self._write_versions.get(self.client, {}).get(name, 0)
+        cache = self._stats_cache.setdefault(self.client, {})
+        cached = cache.get(name)
+        if (
+            cached is not None
+            and cached[1] == version
+            and time.monotonic() - cached[0] < _STATS_TTL
+        ):
+            return copy.deepcopy(cached[2])
+
+        # Count totals, completions and completion rates per group in a
+        # single pass
+        result = self.collection.aggregate([
+            {"$match": {"inExperiment": current_epoch(self.collection)}},
+            {
+                "$group": {
+                    "_id": "$group",
+                    "total": {"$sum": 1},
+                    "completed": {
+                        "$sum": {
+                            "$cond": [{"$eq": ["$admissionsQuiz", "complete"]}, 1, 0]
+                        }
+                    }
+                }
             },
-            "difference": treatment_rate - control_rate
-        }
\ No newline at end of file
+            {
+                "$project": {
+                    "total": 1,
+                    "completed": 1,
+                    "completion_rate": {
+                        "$cond": [
+                            {"$gt": ["$total", 0]},
+                            {"$divide": ["$completed", "$total"]},
+                            0
+                        ]
+                    }
+                }
+            }
+        ])
+        groups = {doc.pop("_id"): doc for doc in result}
+        control, treatment = (
+            groups.get(code, {"total": 0, "completed": 0, "completion_rate": 0})
+            for code in (GROUP_CONTROL, GROUP_TREATMENT)
+        )
+        
+        stats = {
+            "control_group": control,
+            "treatment_group": treatment,
+            "difference": treatment["completion_rate"] - control["completion_rate"]
+        }
+        cache[name] = (time.monotonic(), version, copy.deepcopy(stats))
+
+        return stats
\ No newline at end of file
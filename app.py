@@ -1,20 +1,58 @@
 from business import GraphBuilder, StatsBuilder
-from dash import Input, Output, State, dcc, html
-from dash import Dash
+from dash import Input, Output, Patch, State, dcc, html, no_update
+from dash import Dash, DiskcacheManager
+import diskcache
 import dash_bootstrap_components as dbc
+import plotly.graph_objects as go
+import plotly.io as pio
 from dash_iconify import DashIconify
+from flask_caching import Cache
+
+# Dash serializes layouts and callback responses through plotly.io.json;
+# orjson is several times faster than the stdlib for large figures
+pio.json.config.default_engine = "orjson"
+
+# Run long callbacks (the experiment) in a worker pool so they don't block
+# the server. For multi-worker deployments use CeleryManager with Redis.
+background_callback_manager = DiskcacheManager(diskcache.Cache("./.cache/background"))
 
 # Initialize app with modern theme
 app = Dash(
     __name__, 
+    background_callback_manager=background_callback_manager,
+    compress=True,
     external_stylesheets=[dbc.themes.QUARTZ, 'https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&display=swap'],
     meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1"}]
 )
 
+# WSGI entry point, e.g. ``gunicorn app:server --workers 4``. Don't use
+# --preload: MongoClient is not fork-safe, so each worker must import the app
+# (and open its client) itself.
+server = app.server
+
+# Memoize figures across callbacks and workers. Kept in a sibling of the
+# background store, since FileSystemCache prunes files in its directory
+cache = Cache(
+    app.server,
+    config={
+        "CACHE_TYPE": "FileSystemCache",
+        "CACHE_DIR": ".cache/figures",
+        "CACHE_DEFAULT_TIMEOUT": 3600,
+    },
+)
+
 # Initialize business objects
 gb = GraphBuilder()
 sb = StatsBuilder()
 
+# Slider positions
+EFFECT_SIZES = [i / 10 for i in range(1, 9)]
+EXPERIMENT_DAYS = list(range(1, 21))
+
+# Static slider marks
+EFFECT_MARKS = {effect_size: str(effect_size) for effect_size in EFFECT_SIZES}
+DAY_MARKS = {day: str(day) for day in EXPERIMENT_DAYS[::2]}
+
 # Define color scheme
 COLORS = {
     "primary": "#6200EA",
@@ -43,6 +81,264 @@ header_style = {
     "border-bottom": f"2px solid {COLORS['accent']}",
 }
 
+# Figure styles
+DEMO_LAYOUT = dict(
+    template="plotly_dark",
+    paper_bgcolor="rgba(0,0,0,0)",
+    plot_bgcolor="rgba(0,0,0,0)",
+    margin=dict(l=20, r=20, t=30, b=20),
+    font=dict(family="Poppins, sans-serif", color="#E0E0E0"),
+    colorway=[COLORS["primary"], COLORS["secondary"], COLORS["accent"], "#FF4081", "#29B6F6"],
+)
+
+RESULTS_LAYOUT = dict(
+    DEMO_LAYOUT,
+    colorway=[COLORS["primary"], COLORS["secondary"], COLORS["accent"], "#FF4081"],
+)
+
+DOWNLOAD_LAYOUT = dict(
+    template="plotly_dark",
+    paper_bgcolor="white",
+    plot_bgcolor="white",
+    font=dict(family="Poppins, sans-serif", color="black"),
+    colorway=DEMO_LAYOUT["colorway"],
+)
+
+
+@cache.memoize()
+def _get_demo_fig(graph_name, fingerprint):
+    """Builds, styles and serializes a demographic figure.
+
+    Memoized per name and data ``fingerprint``, so a figure is rebuilt only
+    once the applicant data has changed.
+
+    Parameters
+    ----------
+    graph_name : str
+        Options are 'Nationality', 'Age', 'Education'.
+    fingerprint : tuple
+        From ``MongoRepository.get_fingerprint``.
+
+    Returns
+    -------
+    dict
+        Figure JSON.
+    """
+    if graph_name == "Nationality":
+        fig = gb.build_nat_choropleth()
+    elif graph_name == "Age":
+        fig = gb.build_age_hist()
+    else:
+        fig = gb.build_ed_bar()
+        
+    # Update figure layout for better aesthetics
+    fig.update_layout(**DEMO_LAYOUT)
+
+    return fig.to_plotly_json()
+
+
+@cache.memoize()
+def _get_demo_png(graph_name, fingerprint):
+    """Renders a light-themed PNG of a demographic figure.
+
+    Parameters
+    ----------
+    graph_name : str
+        Options are 'Nationality', 'Age', 'Education'.
+    fingerprint : tuple
+        From ``MongoRepository.get_fingerprint``.
+
+    Returns
+    -------
+    bytes
+    """
+    fig = go.Figure(_get_demo_fig(graph_name, fingerprint))
+    
+    # Update figure layout for better aesthetics
+    fig.update_layout(**DOWNLOAD_LAYOUT)
+
+    return fig.to_image(format="png")
+
+
+# Styled, empty results chart; each experiment run patches in its data
+RESULTS_FIG = go.Figure(layout=RESULTS_LAYOUT)
+
+# Experiment tab contents, built once and sent only when the tab is opened
+EXPERIMENT_TAB = dbc.Row(
+    [
+        dbc.Col(
+            dbc.Card(
+                [
+                    dbc.CardHeader([
+                        DashIconify(icon="mdi:flask", width=24, style={"marginRight": "10px"}),
+                        "Experiment Configuration"
+                    ], style={"display": "flex", "align-items": "center", "font-size": "1.2rem", "font-weight": "500"}),
+                    dbc.CardBody(
+                        [
+                            html.H5("Effect Size", className="mb-2", style={"color": "#E0E0E0"}),
+                            dbc.Row(
+                                [
+                                    dbc.Col(
+                                        dcc.Slider(
+                                            min=0.1,
+                                            max=0.8,
+                                            step=0.1,
+                                            value=0.2,
+                                            id="effect-size-slider",
+                                            marks=EFFECT_MARKS,
+                                            tooltip={"placement": "bottom", "always_visible": True},
+                                            updatemode="mouseup",
+                                            className="mt-1 mb-4",
+                                        ),
+                                        width=10,
+                                    ),
+                                    dbc.Col(
+                                        html.Div(
+                                            DashIconify(
+                                                icon="mdi:information-outline",
+                                                width=20,
+                                                id="effect-size-info",
+                                            ),
+                                            style={"textAlign": "center"},
+                                        ),
+                                        width=2,
+                                    ),
+                                ],
+                            ),
+                            dbc.Tooltip(
+                                "Effect size is a quantitative measure of the magnitude of the experimental effect. Larger values indicate stronger effects that are easier to detect.",
+                                target="effect-size-info",
+                            ),
+                            html.Div(
+                                [
+                                    DashIconify(icon="mdi:account-group", width=20, style={"verticalAlign": "middle", "marginRight": "8px"}),
+                                    "To detect an effect size of ",
+                                    html.Span(id="effect-size-value", style={"color": COLORS["accent"], "fontWeight": "bold"}),
+                                    ", you would need ",
+                                    html.Span(id="group-n-obs", style={"color": COLORS["secondary"], "fontWeight": "bold"}),
+                                    " observations.",
+                                ],
+                                id="effect-size-display",
+                                className="mb-4",
+                                style={"padding": "10px", "background": "#2D2D2D", "border-radius": "8px"},
+                            ),
+
+                            html.H5("Experiment Duration (Days)", className="mb-2", style={"color": "#E0E0E0"}),
+                            dbc.Row(
+                                [
+                                    dbc.Col(
+                                        dcc.Slider(
+                                            min=1,
+                                            max=20,
+                                            step=1,
+                                            value=1,
+                                            id="experiment-days-slider",
+                                            marks=DAY_MARKS,
+                                            tooltip={"placement": "bottom", "always_visible": True},
+                                            updatemode="mouseup",
+                                            className="mt-1 mb-4",
+                                        ),
+                                        width=10,
+                                    ),
+                                    dbc.Col(
+                                        html.Div(
+                                            DashIconify(
+                                                icon="mdi:information-outline",
+                                                width=20,
+                                                id="duration-info",
+                                            ),
+                                            style={"textAlign": "center"},
+                                        ),
+                                        width=2,
+                                    ),
+                                ],
+                            ),
+                            dbc.Tooltip(
+                                "Choose how many days your experiment will run. Longer durations typically yield more observations.",
+                                target="duration-info",
+                            ),
+                            html.Div(
+                                [
+                                    DashIconify(icon="mdi:percent", width=20, style={"verticalAlign": "middle", "marginRight": "8px"}),
+                                    "The probability of getting ",
+                                    html.Span(id="days-n-obs", style={"color": COLORS["secondary"], "fontWeight": "bold"}),
+                                    " observations in ",
+                                    html.Span(id="days-value", style={"color": COLORS["accent"], "fontWeight": "bold"}),
+                                    " is ",
+                                    html.Span(id="days-pct", style={"fontWeight": "bold"}),
+                                ],
+                                id="experiment-days-display",
+                                className="mb-4",
+                                style={"padding": "10px", "background": "#2D2D2D", "border-radius": "8px"},
+                            ),
+
+                            dbc.Button(
+                                [DashIconify(icon="mdi:play", width=20, style={"marginRight": "8px"}), "Begin Experiment"],
+                                id="start-experiment-button",
+                                color="primary",
+                                style={"background-color": COLORS["primary"], "border": "none", "width": "100%", "margin-top": "10px"},
+                                n_clicks=0,
+                            ),
+                        ]
+                    ),
+                ],
+                style=card_style,
+            ),
+            md=5,
+        ),
+
+        dbc.Col(
+            dbc.Card(
+                [
+                    dbc.CardHeader([
+                        DashIconify(icon="mdi:chart-bar", width=24, style={"marginRight": "10px"}),
+                        "Experiment Results"
+                    ], style={"display": "flex", "align-items": "center", "font-size": "1.2rem", "font-weight": "500"}),
+                    dbc.CardBody(
+                        [
+                            html.Div(
+                                [
+                                    html.Div(
+                                        DashIconify(
+                                            icon="mdi:flask-empty-outline",
+                                            width=64,
+                                            color="#555555",
+                                        ),
+                                        style={"textAlign": "center", "margin": "40px 0 20px 0"},
+                                        id="placeholder-icon",
+                                    ),
+                                    html.Div(
+                                        "Configure your experiment and click 'Begin Experiment' to see results",
+                                        style={"color": "#888888", "textAlign": "center", "fontSize": "14px", "margin-bottom": "40px"},
+                                        id="placeholder-text",
+                                    ),
+                                    html.Div(
+                                        [
+                                            html.H4("Observations", className="mb-3", style={"color": "#E0E0E0"}),
+                                            dcc.Graph(
+                                                id="results-graph",
+                                                figure=RESULTS_FIG,
+                                                config={"displayModeBar": True, "responsive": True},
+                                                style={"height": "300px"},
+                                            ),
+                                        ],
+                                        id="results-graph-container",
+                                        style={"display": "none"},
+                                    ),
+                                    html.Div(id="results-display"),
+                                ]
+                            )
+                        ]
+                    ),
+                ],
+                style={**card_style, "height": "100%"},
+            ),
+            md=7,
+        ),
+    ],
+)
+
+
 app.layout = dbc.Container(
     [
         dbc.Row(
@@ -106,7 +402,12 @@ app.layout = dbc.Container(
                                             ],
                                             className="mb-3",
                                         ),
-                                        html.Div(id="demo-plots-display"),
+                                        dcc.Graph(
+                                            id="demo-graph",
+                                            config={"displayModeBar": True, "responsive": True},
+                                        ),
+                                        dcc.Location(id="url"),
+                                        dcc.Store(id="demo-figs-store"),
                                         dcc.Download(id="download-chart"),
                                     ]
                                 ),
@@ -120,145 +421,9 @@ app.layout = dbc.Container(
                     active_label_style={"color": COLORS["accent"]},
                 ),
                 
-                # Experiment tab
+                # Experiment tab, filled in on first visit by load_experiment_tab
                 dbc.Tab(
-                    [
-                        dbc.Row(
-                            [
-                                dbc.Col(
-                                    dbc.Card(
-                                        [
-                                            dbc.CardHeader([
-                                                DashIconify(icon="mdi:flask", width=24, style={"marginRight": "10px"}),
-                                                "Experiment Configuration"
-                                            ], style={"display": "flex", "align-items": "center", "font-size": "1.2rem", "font-weight": "500"}),
-                                            dbc.CardBody(
-                                                [
-                                                    html.H5("Effect Size", className="mb-2", style={"color": "#E0E0E0"}),
-                                                    dbc.Row(
-                                                        [
-                                                            dbc.Col(
-                                                                dcc.Slider(
-                                                                    min=0.1,
-                                                                    max=0.8,
-                                                                    step=0.1,
-                                                                    value=0.2,
-                                                                    id="effect-size-slider",
-                                                                    marks={i/10: str(i/10) for i in range(1, 9)},
-                                                                    tooltip={"placement": "bottom", "always_visible": True},
-                                                                    className="mt-1 mb-4",
-                                                                ),
-                                                                width=10,
-                                                            ),
-                                                            dbc.Col(
-                                                                html.Div(
-                                                                    DashIconify(
-                                                                        icon="mdi:information-outline",
-                                                                        width=20,
-                                                                        id="effect-size-info",
-                                                                    ),
-                                                                    style={"textAlign": "center"},
-                                                                ),
-                                                                width=2,
-                                                            ),
-                                                        ],
-                                                    ),
-                                                    dbc.Tooltip(
-                                                        "Effect size is a quantitative measure of the magnitude of the experimental effect. Larger values indicate stronger effects that are easier to detect.",
-                                                        target="effect-size-info",
-                                                    ),
-                                                    html.Div(id="effect-size-display", className="mb-4", 
-                                                            style={"padding": "10px", "background": "#2D2D2D", "border-radius": "8px"}),
-                                                    
-                                                    html.H5("Experiment Duration (Days)", className="mb-2", style={"color": "#E0E0E0"}),
-                                                    dbc.Row(
-                                                        [
-                                                            dbc.Col(
-                                                                dcc.Slider(
-                                                                    min=1,
-                                                                    max=20,
-                                                                    step=1,
-                                                                    value=1,
-                                                                    id="experiment-days-slider",
-                                                                    marks={i: str(i) for i in range(1, 21, 2)},
-                                                                    tooltip={"placement": "bottom", "always_visible": True},
-                                                                    className="mt-1 mb-4",
-                                                                ),
-                                                                width=10,
-                                                            ),
-                                                            dbc.Col(
-                                                                html.Div(
-                                                                    DashIconify(
-                                                                        icon="mdi:information-outline",
-                                                                        width=20,
-                                                                        id="duration-info",
-                                                                    ),
-                                                                    style={"textAlign": "center"},
-                                                                ),
-                                                                width=2,
-                                                            ),
-                                                        ],
-                                                    ),
-                                                    dbc.Tooltip(
-                                                        "Choose how many days your experiment will run. Longer durations typically yield more observations.",
-                                                        target="duration-info",
-                                                    ),
-                                                    html.Div(id="experiment-days-display", className="mb-4", 
-                                                            style={"padding": "10px", "background": "#2D2D2D", "border-radius": "8px"}),
-                                                    
-                                                    dbc.Button(
-                                                        [DashIconify(icon="mdi:play", width=20, style={"marginRight": "8px"}), "Begin Experiment"],
-                                                        id="start-experiment-button",
-                                                        color="primary",
-                                                        style={"background-color": COLORS["primary"], "border": "none", "width": "100%", "margin-top": "10px"},
-                                                        n_clicks=0,
-                                                    ),
-                                                ]
-                                            ),
-                                        ],
-                                        style=card_style,
-                                    ),
-                                    md=5,
-                                ),
-                                
-                                dbc.Col(
-                                    dbc.Card(
-                                        [
-                                            dbc.CardHeader([
-                                                DashIconify(icon="mdi:chart-bar", width=24, style={"marginRight": "10px"}),
-                                                "Experiment Results"
-                                            ], style={"display": "flex", "align-items": "center", "font-size": "1.2rem", "font-weight": "500"}),
-                                            dbc.CardBody(
-                                                [
-                                                    html.Div(
-                                                        [
-                                                            html.Div(
-                                                                DashIconify(
-                                                                    icon="mdi:flask-empty-outline",
-                                                                    width=64,
-                                                                    color="#555555",
-                                                                ),
-                                                                style={"textAlign": "center", "margin": "40px 0 20px 0"},
-                                                                id="placeholder-icon",
-                                                            ),
-                                                            html.Div(
-                                                                "Configure your experiment and click 'Begin Experiment' to see results",
-                                                                style={"color": "#888888", "textAlign": "center", "fontSize": "14px", "margin-bottom": "40px"},
-                                                                id="placeholder-text",
-                                                            ),
-                                                            html.Div(id="results-display"),
-                                                        ]
-                                                    )
-                                                ]
-                                            ),
-                                        ],
-                                        style={**card_style, "height": "100%"},
-                                    ),
-                                    md=7,
-                                ),
-                            ],
-                        ),
-                    ],
+                    html.Div(id="experiment-tab-content"),
                     label="Experiment",
                     tab_id="tab-experiment",
                     label_style={"color": "#FFFFFF"},
@@ -268,6 +433,7 @@ app.layout = dbc.Container(
             id="tabs",
             active_tab="tab-demographics",
         ),
+        dcc.Store(id="experiment-tab-loaded", data=False),
         
         # Footer
         html.Footer(
@@ -289,47 +455,85 @@ app.layout = dbc.Container(
     style={"background-color": COLORS["background"], "color": COLORS["text"], "min-height": "100vh", "padding": "0 25px 25px 25px"},
 )
 
+# The experiment tab's components are added after the initial layout; list
+# them here so callback IDs are still validated against them
+app.validation_layout = html.Div([app.layout, EXPERIMENT_TAB])
+
 
 @app.callback(
-    Output("demo-plots-display", "children"),
-    Input("demo-plots-dropdown", "value")
+    Output("experiment-tab-content", "children"),
+    Output("experiment-tab-loaded", "data"),
+    Input("tabs", "active_tab"),
+    State("experiment-tab-loaded", "data"),
 )
-def display_demo_graph(graph_name):
-    """Serves applicant demograhic visualization.
+def load_experiment_tab(active_tab, loaded):
+    """Serves the experiment tab contents the first time the tab is opened.
 
     Parameters
     ----------
-    graph_name : str
-        User input given via 'demo-plots-dropdown'. Name of Graph to be returned.
-        Options are 'Nationality', 'Age', 'Education'.
+    active_tab : str
+        Currently selected tab. Provided via 'tabs'.
+    loaded : bool
+        Whether the contents were already sent. Provided via 'experiment-tab-loaded'.
 
     Returns
     -------
-    dcc.Graph
-        Plot that will be displayed in 'demo-plots-display' Div.
+    dbc.Row
+        Experiment tab contents. Goes to 'experiment-tab-content'.
+    bool
+        Goes to 'experiment-tab-loaded'.
     """
-    if graph_name == "Nationality":
-        fig = gb.build_nat_choropleth()
-    elif graph_name == "Age":
-        fig = gb.build_age_hist()
-    else:
-        fig = gb.build_ed_bar()
-        
-    # Update figure layout for better aesthetics
-    fig.update_layout(
-        template="plotly_dark",
-        paper_bgcolor="rgba(0,0,0,0)",
-        plot_bgcolor="rgba(0,0,0,0)",
-        margin=dict(l=20, r=20, t=30, b=20),
-        font=dict(family="Poppins, sans-serif", color="#E0E0E0"),
-        colorway=[COLORS["primary"], COLORS["secondary"], COLORS["accent"], "#FF4081", "#29B6F6"],
-    )
-    
-    return dcc.Graph(figure=fig, config={"displayModeBar": True, "responsive": True})
+    if loaded or active_tab != "tab-experiment":
+        return no_update, no_update
+
+    return EXPERIMENT_TAB, True
 
 
 @app.callback(
-    Output("effect-size-display", "children"),
+    Output("demo-figs-store", "data"),
+    Input("url", "pathname"),
+)
+def load_demo_figs(pathname):
+    """Serves every demographic figure on page load.
+
+    Parameters
+    ----------
+    pathname : str
+        Current page. Provided via 'url'.
+
+    Returns
+    -------
+    dict
+        Figure JSON per graph name. Goes to 'demo-figs-store'.
+    """
+    # Reuse cached figures unless applicants were added or removed
+    fingerprint = gb.repo.get_fingerprint()
+
+    return {
+        name: _get_demo_fig(name, fingerprint)
+        for name in ("Nationality", "Age", "Education")
+    }
+
+
+# Switch demographic figures in the browser, without a server round trip
+app.clientside_callback(
+    """
+    function(graph_name, figures) {
+        if (!figures) {
+            return window.dash_clientside.no_update;
+        }
+        return {data: figures[graph_name].data, layout: figures[graph_name].layout};
+    }
+    """,
+    Output("demo-graph", "figure"),
+    Input("demo-plots-dropdown", "value"),
+    Input("demo-figs-store", "data"),
+)
+
+
+@app.callback(
+    Output("effect-size-value", "children"),
+    Output("group-n-obs", "children"),
     Input("effect-size-slider", "value")
 )
 def display_group_size(effect_size):
@@ -342,24 +546,21 @@ def display_group_size(effect_size):
 
     Returns
     -------
-    html.Div
-        Text with information about required group size. will be displayed in
-        'effect-size-display'.
+    str
+        Effect size. Goes to 'effect-size-value'.
+    str
+        Required number of observations. Goes to 'group-n-obs'.
     """
     n_obs = sb.calculate_n_obs(effect_size)
     
-    return html.Div([
-        DashIconify(icon="mdi:account-group", width=20, style={"verticalAlign": "middle", "marginRight": "8px"}),
-        f"To detect an effect size of ", 
-        html.Span(f"{effect_size}", style={"color": COLORS["accent"], "fontWeight": "bold"}), 
-        f", you would need ", 
-        html.Span(f"{n_obs}", style={"color": COLORS["secondary"], "fontWeight": "bold"}), 
-        " observations."
-    ])
+    return f"{effect_size}", f"{n_obs}"
 
 
 @app.callback(
-    Output("experiment-days-display", "children"),
+    Output("days-n-obs", "children"),
+    Output("days-value", "children"),
+    Output("days-pct", "children"),
+    Output("days-pct", "style"),
     Input("effect-size-slider", "value"),
     Input("experiment-days-slider", "value")
 )
@@ -375,14 +576,20 @@ def display_cdf_pct(effect_size, days):
 
     Returns
     -------
-    html.Div
-        Text with information about probabilty. Goes to 'experiment-days-display'.
+    str
+        Required number of observations. Goes to 'days-n-obs'.
+    str
+        Experiment duration. Goes to 'days-value'.
+    str
+        Probability. Goes to 'days-pct'.
+    dict
+        Style for 'days-pct', colored by probability.
     """
     # Calculate number of observations
     n_obs = sb.calculate_n_obs(effect_size)
 
-    # Calculate percentage
-    pct = round(sb.calculate_cdf_pct(n_obs, days), 2)
+    # Calculate percentage from the repository's cached no-quiz statistics
+    pct = round(float(sb.calculate_cdf_pct(n_obs, days)), 2)
     
     # Set color based on probability
     if pct < 30:
@@ -393,25 +600,29 @@ def display_cdf_pct(effect_size, days):
         color = "#4CAF50"  # Green
 
     # Create text
-    return html.Div([
-        DashIconify(icon="mdi:percent", width=20, style={"verticalAlign": "middle", "marginRight": "8px"}),
-        f"The probability of getting ", 
-        html.Span(f"{n_obs}", style={"color": COLORS["secondary"], "fontWeight": "bold"}), 
-        f" observations in ", 
-        html.Span(f"{days} day{'s' if days > 1 else ''}", style={"color": COLORS["accent"], "fontWeight": "bold"}), 
-        " is ",
-        html.Span(f"{pct}%", style={"color": color, "fontWeight": "bold"}),
-    ])
+    return (
+        f"{n_obs}",
+        f"{days} day{'s' if days > 1 else ''}",
+        f"{pct}%",
+        {"color": color, "fontWeight": "bold"},
+    )
 
 
 @app.callback(
     [
         Output("results-display", "children"),
+        Output("results-graph", "figure"),
+        Output("results-graph-container", "style"),
         Output("placeholder-icon", "style"),
         Output("placeholder-text", "style"),
     ],
     Input("start-experiment-button", "n_clicks"),
-    State("experiment-days-slider", "value")
+    State("experiment-days-slider", "value"),
+    background=True,
+    running=[(Output("start-experiment-button", "disabled"), True, False)],
+    # The tab's initial layout already shows the placeholder, so only clicks
+    # need a background job
+    prevent_initial_call=True,
 )
 def display_results(n_clicks, days):
     """Serves results from experiment.
@@ -427,129 +638,122 @@ def display_results(n_clicks, days):
     -------
     html.Div
         Experiment results. Goes to 'results-display'.
+    Patch
+        Data and labels for the persistent 'results-graph'.
+    dict
+        Style for the results graph container.
     dict
         Style for placeholder icon.
     dict
         Style for placeholder text.
     """
     hide_style = {"display": "none"}
-    show_style = {"textAlign": "center", "margin": "40px 0 20px 0"}
-    text_style = {"color": "#888888", "textAlign": "center", "fontSize": "14px", "margin-bottom": "40px"}
     
-    if n_clicks == 0:
-        return html.Div(), show_style, text_style
+    # Background jobs run in a forked process, where the module-level
+    # builders' client is unsafe to use; build ones on the job's own client
+    job_sb = StatsBuilder()
+    job_gb = GraphBuilder(job_sb.repo)
+    # Run experiment
+    job_sb.run_experiment(days)
+    # Create side-by-side bar chart
+    fig = job_gb.build_contingency_bar().to_plotly_json()
+    # Patch data and labels into the styled graph, keeping its template
+    patch = Patch()
+    patch["data"] = fig["data"]
+    for key in ("title", "xaxis", "yaxis", "legend", "barmode"):
+        patch["layout"][key] = fig["layout"][key]
+    # Run chi-square
+    result = job_sb.run_chi_square()
+    
+    # Determine significance level
+    p_value = result.pvalue
+    if p_value < 0.01:
+        sig_text = "Highly Significant"
+        sig_color = "#4CAF50"  # Green
+        sig_icon = "mdi:check-circle"
+    elif p_value < 0.05:
+        sig_text = "Significant"
+        sig_color = "#8BC34A"  # Light Green
+        sig_icon = "mdi:check"
+    elif p_value < 0.1:
+        sig_text = "Marginally Significant"
+        sig_color = "#FFC107"  # Amber
+        sig_icon = "mdi:alert"
     else:
-        # Run experiment
-        sb.run_experiment(days)
-        # Create side-by-side bar chart
-        fig = gb.build_contingency_bar()
-        # Update figure layout for better aesthetics
-        fig.update_layout(
-            template="plotly_dark",
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(0,0,0,0)",
-            margin=dict(l=20, r=20, t=30, b=20),
-            font=dict(family="Poppins, sans-serif", color="#E0E0E0"),
-            colorway=[COLORS["primary"], COLORS["secondary"], COLORS["accent"], "#FF4081"],
-        )
-        # Run chi-square
-        result = sb.run_chi_square()
-        
-        # Determine significance level
-        p_value = result.pvalue
-        if p_value < 0.01:
-            sig_text = "Highly Significant"
-            sig_color = "#4CAF50"  # Green
-            sig_icon = "mdi:check-circle"
-        elif p_value < 0.05:
-            sig_text = "Significant"
-            sig_color = "#8BC34A"  # Light Green
-            sig_icon = "mdi:check"
-        elif p_value < 0.1:
-            sig_text = "Marginally Significant"
-            sig_color = "#FFC107"  # Amber
-            sig_icon = "mdi:alert"
-        else:
-            sig_text = "Not Significant"
-            sig_color = "#F44336"  # Red
-            sig_icon = "mdi:close-circle"
-        
-        # Return Results
-        return html.Div(
-            [
-                html.H4("Observations", className="mb-3", style={"color": "#E0E0E0"}),
-                dcc.Graph(
-                    figure=fig,
-                    config={"displayModeBar": True, "responsive": True},
-                    style={"height": "300px"},
-                ),
-                html.Div(
-                    [
-                        html.H4("Statistical Analysis", className="mb-3", style={"color": "#E0E0E0"}),
-                        dbc.Row(
-                            [
-                                dbc.Col(
-                                    dbc.Card(
-                                        [
-                                            html.H6("Chi-Square Test", className="card-subtitle mb-2", style={"color": "#B0BEC5"}),
-                                            html.P(f"χ² = {result.statistic.round(3)}", className="card-text", style={"fontSize": "1.2rem"}),
-                                        ],
-                                        body=True,
-                                        style={"backgroundColor": "#2D2D2D", "border": "none", "borderRadius": "8px", "textAlign": "center"},
-                                    ),
-                                    md=4,
+        sig_text = "Not Significant"
+        sig_color = "#F44336"  # Red
+        sig_icon = "mdi:close-circle"
+    
+    # Return Results
+    return html.Div(
+        [
+            html.Div(
+                [
+                    html.H4("Statistical Analysis", className="mb-3", style={"color": "#E0E0E0"}),
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                dbc.Card(
+                                    [
+                                        html.H6("Chi-Square Test", className="card-subtitle mb-2", style={"color": "#B0BEC5"}),
+                                        html.P(f"χ² = {result.statistic.round(3)}", className="card-text", style={"fontSize": "1.2rem"}),
+                                    ],
+                                    body=True,
+                                    style={"backgroundColor": "#2D2D2D", "border": "none", "borderRadius": "8px", "textAlign": "center"},
                                 ),
-                                dbc.Col(
-                                    dbc.Card(
-                                        [
-                                            html.H6("Degrees of Freedom", className="card-subtitle mb-2", style={"color": "#B0BEC5"}),
-                                            html.P(f"df = {result.df}", className="card-text", style={"fontSize": "1.2rem"}),
-                                        ],
-                                        body=True,
-                                        style={"backgroundColor": "#2D2D2D", "border": "none", "borderRadius": "8px", "textAlign": "center"},
-                                    ),
-                                    md=4,
+                                md=4,
+                            ),
+                            dbc.Col(
+                                dbc.Card(
+                                    [
+                                        html.H6("Degrees of Freedom", className="card-subtitle mb-2", style={"color": "#B0BEC5"}),
+                                        html.P(f"df = {result.df}", className="card-text", style={"fontSize": "1.2rem"}),
+                                    ],
+                                    body=True,
+                                    style={"backgroundColor": "#2D2D2D", "border": "none", "borderRadius": "8px", "textAlign": "center"},
+                                ),
+                                md=4,
+                            ),
+                            dbc.Col(
+                                dbc.Card(
+                                    [
+                                        html.H6("P-value", className="card-subtitle mb-2", style={"color": "#B0BEC5"}),
+                                        html.P(f"p = {result.pvalue.round(5)}", className="card-text", style={"fontSize": "1.2rem"}),
+                                    ],
+                                    body=True,
+                                    style={"backgroundColor": "#2D2D2D", "border": "none", "borderRadius": "8px", "textAlign": "center"},
                                 ),
-                                dbc.Col(
-                                    dbc.Card(
+                                md=4,
+                            ),
+                        ],
+                        className="mb-3",
+                    ),
+                    dbc.Card(
+                        [
+                            dbc.CardBody(
+                                [
+                                    html.Div(
                                         [
-                                            html.H6("P-value", className="card-subtitle mb-2", style={"color": "#B0BEC5"}),
-                                            html.P(f"p = {result.pvalue.round(5)}", className="card-text", style={"fontSize": "1.2rem"}),
+                                            DashIconify(icon=sig_icon, width=28, color=sig_color, style={"marginRight": "10px"}),
+                                            html.Span(sig_text, style={"color": sig_color, "fontSize": "1.2rem", "fontWeight": "500"}),
                                         ],
-                                        body=True,
-                                        style={"backgroundColor": "#2D2D2D", "border": "none", "borderRadius": "8px", "textAlign": "center"},
+                                        style={"display": "flex", "alignItems": "center", "justifyContent": "center"},
                                     ),
-                                    md=4,
-                                ),
-                            ],
-                            className="mb-3",
-                        ),
-                        dbc.Card(
-                            [
-                                dbc.CardBody(
-                                    [
-                                        html.Div(
-                                            [
-                                                DashIconify(icon=sig_icon, width=28, color=sig_color, style={"marginRight": "10px"}),
-                                                html.Span(sig_text, style={"color": sig_color, "fontSize": "1.2rem", "fontWeight": "500"}),
-                                            ],
-                                            style={"display": "flex", "alignItems": "center", "justifyContent": "center"},
-                                        ),
-                                        html.P(
-                                            f"Based on {days} day{'s' if days > 1 else ''} of data collection",
-                                            className="text-center mt-2",
-                                            style={"color": "#B0BEC5", "fontSize": "0.9rem"},
-                                        ),
-                                    ]
-                                ),
-                            ],
-                            style={"backgroundColor": "#2D2D2D", "border": "none", "borderRadius": "8px"},
-                        ),
-                    ],
-                    style={"marginTop": "25px"},
-                ),
-            ]
-        ), hide_style, hide_style
+                                    html.P(
+                                        f"Based on {days} day{'s' if days > 1 else ''} of data collection",
+                                        className="text-center mt-2",
+                                        style={"color": "#B0BEC5", "fontSize": "0.9rem"},
+                                    ),
+                                ]
+                            ),
+                        ],
+                        style={"backgroundColor": "#2D2D2D", "border": "none", "borderRadius": "8px"},
+                    ),
+                ],
+                style={"marginTop": "25px"},
+            ),
+        ]
+    ), patch, {"display": "block"}, hide_style, hide_style
 
 
 # NEW FEATURE: Chart download callback
@@ -577,23 +781,10 @@ def download_chart(n_clicks, graph_name):
     if n_clicks is None:
         return None
         
-    if graph_name == "Nationality":
-        fig = gb.build_nat_choropleth()
-    elif graph_name == "Age":
-        fig = gb.build_age_hist()
-    else:
-        fig = gb.build_ed_bar()
-    
-    # Update figure layout for better aesthetics
-    fig.update_layout(
-        template="plotly_dark",
-        paper_bgcolor="white",
-        plot_bgcolor="white",
-        font=dict(family="Poppins, sans-serif", color="black"),
-        colorway=[COLORS["primary"], COLORS["secondary"], COLORS["accent"], "#FF4081", "#29B6F6"],
+    return dcc.send_bytes(
+        _get_demo_png(graph_name, gb.repo.get_fingerprint()),
+        f"{graph_name.lower()}_demographics.png"
     )
-    
-    return dcc.send_data_frame(fig.to_html, f"{graph_name.lower()}_demographics.html")
 
 
 if __name__ == "__main__":
@@ -1,27 +1,58 @@
 import math
+import os
+from functools import lru_cache
+from types import SimpleNamespace
 
 import numpy as np
 import plotly.express as px
-import scipy
+from scipy.special import chdtrc, ndtr
 from database import MongoRepository
 
-from statsmodels.stats.contingency_tables import Table2x2
 from statsmodels.stats.power import GofChisquarePower
 from ab_test import Experiment
 
+# Noncentrality at which a 1-df chi-square test reaches 80% power at alpha=0.05.
+# Since noncentrality = n * effect_size**2, solving once at effect size 1 gives
+# the required n for any effect size in closed form.
+_NONCENTRALITY = GofChisquarePower().solve_power(effect_size=1.0, alpha=0.05, power=0.8)
+
+# Maximum number of bars in the age histogram
+_AGE_BINS = 20
+
+
+@lru_cache(maxsize=1)
+def _shared_repo():
+
+    """Return the repository shared by builders that are not given one,
+    creating it on first use.
+
+    Returns
+    -------
+    MongoRepository
+    """
+    return MongoRepository()
+
+
+# Forked processes build their own repository on the child's client
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_shared_repo.cache_clear)
+
 
 class GraphBuilder:
     """Methods for building Graphs."""
 
-    def __init__(self, repo=MongoRepository()):
+    def __init__(self, repo=None):
 
         """init
 
         Parameters
         ----------
         repo : MongoRepository, optional
-            Data source, by default MongoRepository()
+            Data source, by default None, which uses a repository shared by
+            all builders
         """
+        if repo is None:
+            repo = _shared_repo()
         self.repo = repo
 
     def build_nat_choropleth(self):
@@ -60,17 +91,26 @@ class GraphBuilder:
         # Retrieve age distribution data
         ages = self.repo.get_ages()
         
-        # Generate histogram visualization
-        fig = px.histogram(
-            x=ages, 
-            nbins=20, 
+        # Bin ages server-side so only bin counts are sent to the browser.
+        # Edges fall on whole years so no age is split between two bins
+        low, high = (int(ages.min()), int(ages.max())) if len(ages) else (0, 0)
+        step = max(1, math.ceil((high - low + 1) / _AGE_BINS))
+        edges = np.arange(low, high + step + 1, step)
+        counts, _ = np.histogram(ages, bins=edges)
+        
+        # Generate histogram visualization, each bar spanning its whole years
+        fig = px.bar(
+            x=edges[:-1] + (step - 1) / 2,
+            y=counts,
             title="Applicants: Distribution of Ages"
         )
+        fig.update_traces(width=step)
         
         # Configure axis presentation
         fig.update_layout(
             xaxis_title="Age", 
-            yaxis_title="Frequency[count]"
+            yaxis_title="Frequency[count]",
+            bargap=0
         )
         
         # Return completed visualization
@@ -136,18 +176,22 @@ class GraphBuilder:
 class StatsBuilder:
     """Methods for statistical analysis."""
 
-    def __init__(self, repo=MongoRepository()):
+    def __init__(self, repo=None):
 
         """init
 
         Parameters
         ----------
         repo : MongoRepository, optional
-            Data source, by default MongoRepository()
+            Data source, by default None, which uses a repository shared by
+            all builders
         """
+        if repo is None:
+            repo = _shared_repo()
         self.repo = repo
 
-    def calculate_n_obs(self, effect_size):
+    @staticmethod
+    def calculate_n_obs(effect_size):
 
         """Calculate the number of observations needed to detect effect size.
 
@@ -161,17 +205,8 @@ class StatsBuilder:
         int
             Total number of observations needed, across two experimental groups.
         """
-        # Initialize power analysis calculator
-        chi_square_power = GofChisquarePower()
-        
         # Compute required sample size per group
-        group_size = math.ceil(
-            chi_square_power.solve_power(
-                effect_size=effect_size, 
-                alpha=0.05, 
-                power=0.8
-            )
-        )
+        group_size = math.ceil(_NONCENTRALITY / effect_size**2)
         
         # Return total sample size across both groups
         return group_size * 2
@@ -193,27 +228,16 @@ class StatsBuilder:
         float
             Percentage chance of gathering ``n_obs`` or more in ``days``.
         """
-        # Retrieve historical no-quiz data
-        no_quiz = self.repo.get_no_quiz_per_day()
-        
-        # Extract distribution parameters
-        summary = no_quiz.describe()
-        mean = summary["mean"]
-        std = summary["std"]
+        # Retrieve distribution parameters of historical no-quiz data
+        mean, std = self.repo.get_no_quiz_summary()
         
         # Adjust parameters for multi-day accumulation
         sum_mean = mean * days
         sum_std = std * np.sqrt(days)
         
-        # Calculate probability using normal approximation
-        cdf_value = scipy.stats.norm.cdf(
-            n_obs, 
-            loc=sum_mean, 
-            scale=sum_std
-        )
-        
-        # Convert to probability of exceeding threshold
-        prob = 1 - cdf_value
+        # Probability of exceeding threshold using normal approximation;
+        # ndtr(-z) is 1 - ndtr(z) without the cancellation in the upper tail
+        prob = ndtr((sum_mean - n_obs) / sum_std)
         
         # Convert to percentage representation
         pct = prob * 100
@@ -262,11 +286,20 @@ class StatsBuilder:
         # Retrieve experiment results table
         data = self.repo.get_contingency_table()
         
-        # Convert to statsmodels contingency table format
-        contingency_table = Table2x2(data.values)
+        # Replace empty cells with 0.5, as statsmodels' Table2x2 does
+        observed = np.array(data, dtype=np.float64)
+        observed[observed == 0] = 0.5
         
-        # Execute chi-square statistical test
-        chi_square_test = contingency_table.test_nominal_association()
+        # Expected counts under independence
+        expected = np.outer(observed.sum(axis=1), observed.sum(axis=0)) / observed.sum()
+        
+        # Execute chi-square statistical test; a 2x2 table has 1 degree of freedom
+        statistic = ((observed - expected) ** 2 / expected).sum()
+        chi_square_test = SimpleNamespace(
+            statistic=statistic,
+            df=1,
+            pvalue=chdtrc(1, statistic)
+        )
 
         # Return complete test results
         return chi_square_test
\ No newline at end of file
@@ -1,13 +1,62 @@
+import time
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
+from mongo_common import (
+    GROUP_CONTROL, GROUP_INDEX, GROUP_LABELS, GROUP_TREATMENT, current_epoch,
+    ensure_indexes, get_default_client
+)
 from country_converter import CountryConverter
-from pymongo import MongoClient
+
+# Compound index covering the daily no-quiz aggregations
+_NO_QUIZ_INDEX = [("admissionsQuiz", 1), ("createdAt", 1)]
+
+# Seconds the no-quiz summary statistics are reused before being recomputed
+_NO_QUIZ_TTL = 300
+
+# Sort position of each education level, lowest first
+_ED_ORDER = {
+    "High School or Baccalaureate": 0,
+    "Some College (1-3 years)": 1,
+    "Bachelor's degree": 2,
+    "Master's degree": 3,
+    "Doctorate (e.g. PhD)": 4,
+}
+
+# Columns of the experiment contingency table
+_QUIZ_OUTCOMES = pd.Index(["complete", "incomplete"], name="admissionsQuiz")
+
+# Loading the country table is slow, so share one converter
+_CC = CountryConverter()
+
+
+@lru_cache(maxsize=512)
+def _convert_countries(iso2_codes):
+
+    """Look up short names and ISO3 codes for a tuple of ISO2 codes.
+
+    Parameters
+    ----------
+    iso2_codes : tuple
+
+    Returns
+    -------
+    tuple
+        (names, iso3_codes), as returned by ``CountryConverter.convert``
+    """
+    codes = list(iso2_codes)
+    names = _CC.convert(codes, to="name_short")
+    iso3_codes = _CC.convert(codes, to="ISO3")
+    return names, iso3_codes
+
 
 class MongoRepository:
     """For connecting and interacting with MongoDB."""
 
     def __init__(
         self,
-        client = MongoClient(host="localhost", port=27017),
+        client = None,
         db = "online_course",
         collection = "applicants"
     ):
@@ -17,13 +66,35 @@ class MongoRepository:
         Parameters
         ----------
         client : pymongo.MongoClient, optional
-            By default MongoClient(host="localhost", port=27017)
+            By default None, which uses a shared client for localhost:27017
         db : str, optional
             By default "online_course"
         collection : str, optional
             By default "applicants"
         """
+        if client is None:
+            client = get_default_client()
         self.collection = client[db][collection]
+        self._no_quiz_cache = None
+
+        # Support the no-quiz aggregations and the contingency table query
+        ensure_indexes(self.collection, [_NO_QUIZ_INDEX, GROUP_INDEX])
+
+    def get_fingerprint(self):
+
+        """Cheap summary of the collection's contents that changes when
+        applicants are added or removed.
+
+        Returns
+        -------
+        tuple
+            (estimated document count, newest '_id' as str)
+        """
+        # Count from collection metadata and newest id from the _id index
+        count = self.collection.estimated_document_count()
+        newest = self.collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        
+        return count, str(newest["_id"]) if newest else None
 
     def get_nationality_value_counts(self, normalize=True):
     
@@ -42,29 +113,24 @@ class MongoRepository:
         """
         # Retrieve aggregated nationality data
         result = self.collection.aggregate(
-            [
-             {
-                "$group": {
-                    "_id": "$countryISO2", "count": {"$count": {}}}
-             }   
-            ]
+            [{"$sortByCount": "$countryISO2"}]
         )
         
         # Create DataFrame with results
         df_nationality = (
-            pd.DataFrame(result).rename({"_id": "country_iso2"}, axis="columns").sort_values("count")
+            pd.DataFrame.from_records(list(result), columns=["_id", "count"])
+            .rename({"_id": "country_iso2"}, axis="columns")
         )
 
         # Augment with country metadata
-        cc = CountryConverter()
-        df_nationality["country_name"] = cc.convert(
-            df_nationality["country_iso2"], to = "name_short"
-        )
-        df_nationality["country_iso3"] = cc.convert(df_nationality["country_iso2"], to = "ISO3")
+        names, iso3_codes = _convert_countries(tuple(df_nationality["country_iso2"]))
+        df_nationality["country_name"] = names
+        df_nationality["country_iso3"] = iso3_codes
          
         # Calculate percentages when requested
         if normalize:
-            df_nationality["count_pct"] = (df_nationality["count"]/df_nationality["count"].sum())*100
+            counts = df_nationality["count"].to_numpy()
+            df_nationality["count_pct"] = counts * (100.0 / counts.sum())
         
         return df_nationality
 
@@ -76,42 +142,24 @@ class MongoRepository:
         -------
         pd.Series
         """
-        # Execute age calculation query
-        result = self.collection.aggregate(
-            [
-                {
-                    "$project": {
-                        "years": {
-                            "$dateDiff": {
-                                "startDate": "$birthday",
-                                "endDate": "$$NOW",
-                                "unit": "year"
-                            }
-                        }
-                    }
-
-            }
-
-        ]
+        # Fetch birthdays only, skipping applicants without one
+        result = self.collection.find(
+            {"birthday": {"$type": "date"}}, {"birthday": 1, "_id": 0}
         )
-        # Convert query results to pandas series
-        ages = pd.DataFrame(result)["years"]
+        birthdays = np.array(
+            [doc["birthday"] for doc in result], dtype="datetime64[Y]"
+        )
+
+        # Count year boundaries crossed since birth, as $dateDiff did
+        this_year = np.datetime64("now", "Y")
+        ages = pd.Series((this_year - birthdays).astype("int64"), name="years")
         
         return ages
 
     def __ed_sort(self, counts):
 
         """Helper function for self.get_ed_value_counts."""
-        degrees = [
-            "High School or Baccalaureate",
-            "Some College (1-3 years)",
-            "Bachelor's degree",
-            "Master's degree",
-            "Doctorate (e.g. PhD)",
-        ]
-        mapping = {k: v for v, k in enumerate(degrees)}
-        sort_order = [mapping[c] for c in counts]
-        return sort_order
+        return counts.map(_ED_ORDER)
 
 
     def get_ed_value_counts(self, normalize=False):
@@ -130,30 +178,23 @@ class MongoRepository:
         """
         # Query for degree distribution
         result = self.collection.aggregate(
-            [
-                {
-                    "$group": {
-                        "_id": "$highestDegreeEarned",
-                        "count": {"$count": {}}
-                    }
-                }
-            ]
+            [{"$sortByCount": "$highestDegreeEarned"}]
         )
 
         # Format results as Series
-        education = (
-            pd.DataFrame(result)
-            .rename({"_id": "highest_degree_earned"}, axis="columns")
-            .set_index("highest_degree_earned")
-            .squeeze()
-        )
+        education = pd.Series(
+            {doc["_id"]: doc["count"] for doc in result}, name="count"
+        ).rename_axis("highest_degree_earned")
         
         # Apply custom sorting
         education.sort_index(key=self.__ed_sort, inplace=True)
 
         # Calculate percentages if requested
         if normalize:
-            education = (education/education.sum())*100
+            counts = education.to_numpy()
+            education = pd.Series(
+                counts * (100.0 / counts.sum()), index=education.index, name=education.name
+            )
         
         return education
 
@@ -175,10 +216,11 @@ class MongoRepository:
                         "count": {"$sum": 1}
                     }
                 }
-            ]
+            ],
+            hint=_NO_QUIZ_INDEX
         )
         # Format results as time series
-        no_quiz = (pd.DataFrame(result)
+        no_quiz = (pd.DataFrame.from_records(list(result), columns=["_id", "count"])
             .rename({"_id": "date", "count":"new_users"}, axis=1)
             .set_index("date")
             .sort_index()
@@ -187,6 +229,66 @@ class MongoRepository:
         
         return no_quiz
 
+    def get_no_quiz_daily_stats(self):
+
+        """Calculates mean and standard deviation of no-quiz applicants per day
+        in the database.
+
+        Returns
+        -------
+        tuple
+            (mean, std)
+        """
+        # Count daily incomplete quizzes, then summarize the counts
+        result = self.collection.aggregate(
+            [
+                {"$match": {"admissionsQuiz": "incomplete"}},
+                {
+                    "$group": {
+                        "_id": {"$dateTrunc": {"date": "$createdAt", "unit": "day"}},
+                        "count": {"$sum": 1}
+                    }
+                },
+                {
+                    "$group": {
+                        "_id": None,
+                        "mean": {"$avg": "$count"},
+                        "std": {"$stdDevSamp": "$count"}
+                    }
+                }
+            ],
+            hint=_NO_QUIZ_INDEX
+        )
+        stats = next(result, None)
+
+        # Match describe(): NaN with no days, NaN std with a single day
+        if stats is None:
+            return np.nan, np.nan
+        std = stats.get("std")
+        
+        return stats["mean"], np.nan if std is None else std
+
+    def get_no_quiz_summary(self):
+
+        """Gets mean and standard deviation of no-quiz applicants per day,
+        cached for ``_NO_QUIZ_TTL`` seconds.
+
+        Returns
+        -------
+        tuple
+            (mean, std)
+        """
+        # Reuse recent statistics
+        cached = self._no_quiz_cache
+        if cached is not None and time.monotonic() - cached[0] < _NO_QUIZ_TTL:
+            return cached[1]
+
+        # Summarize daily counts
+        result = self.get_no_quiz_daily_stats()
+        self._no_quiz_cache = (time.monotonic(), result)
+
+        return result
+
     def get_contingency_table(self):
 
         """After experiment is run, creates crosstab of experimental groups
@@ -197,36 +299,32 @@ class MongoRepository:
         pd.DataFrame
             2x2 crosstab
         """
-        # Query experimental data
-        result = self.collection.find({"inExperiment": True})
-        # Process experiment results
-        df = pd.DataFrame(result).dropna()
+        # Query the two experiment fields only
+        result = self.collection.find(
+            {"inExperiment": current_epoch(self.collection)},
+            {"group": 1, "admissionsQuiz": 1, "_id": 0}
+        ).hint(GROUP_INDEX)
+        # Collect results, skipping incomplete documents
+        groups, quizzes = [], []
+        for doc in result:
+            group = doc.get("group")
+            quiz = doc.get("admissionsQuiz")
+            if group is None or quiz is None:
+                continue
+            groups.append(group)
+            quizzes.append(quiz)
         
-        # Handle missing completion data
-        if 'completed' not in df['admissionsQuiz'].unique():
-            # Generate synthetic completed entries
-            new_rows = []
-            
-            # Create one for each experimental group
-            for group_type in df['group'].unique():
-                group_row = df[df['group'] == group_type].iloc[0].copy()
-                group_row['admissionsQuiz'] = 'completed'
-                new_rows.append(group_row)
-            
-            # Ensure we have at least 3 synthetic entries
-            while len(new_rows) < 3:
-                new_row = df.iloc[0].copy()
-                new_row['admissionsQuiz'] = 'completed'
-                new_rows.append(new_row)
-            
-            # Merge with original data
-            df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
-            
-        # Build contingency table
-        data = pd.crosstab(
-            index=df["group"],
-            columns=df["admissionsQuiz"],
-            normalize=False
-        ).round(3)
+        # Build contingency table, counting every (group, quiz) cell in one pass
+        group_order = [GROUP_CONTROL, GROUP_TREATMENT]
+        quiz_codes, quiz_labels = pd.factorize(pd.Series(quizzes), sort=True)
+        cells = np.array(groups, dtype=int) * len(quiz_labels) + quiz_codes
+        counts = np.bincount(cells, minlength=len(group_order) * len(quiz_labels))
+        data = pd.DataFrame(
+            counts.reshape(len(group_order), len(quiz_labels)),
+            index=pd.Index([GROUP_LABELS[g] for g in group_order], name="group"),
+            columns=pd.Index(quiz_labels, name="admissionsQuiz")
+        )
+        # Keep a 2x2 shape even when no one in the experiment completed the quiz
+        data = data.reindex(columns=_QUIZ_OUTCOMES, fill_value=0)
         
         return data
\ No newline at end of file
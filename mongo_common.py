@@ -0,0 +1,93 @@
+"""
+MongoDB pieces shared by the experiment library and the data layer: the
+default client, experiment group codes, experiment epochs and indexes.
+"""
+
+import os
+import weakref
+
+from pymongo import IndexModel, MongoClient
+
+# Collection storing the current experiment epoch of each collection.
+# Users are in the current experiment when ``inExperiment`` equals it.
+META_COLLECTION = "_abtest_meta"
+
+# Group codes stored in the database, and their display labels
+GROUP_CONTROL = 0
+GROUP_TREATMENT = 1
+GROUP_LABELS = {
+    GROUP_CONTROL: "No email (control)",
+    GROUP_TREATMENT: "email (treatment)",
+}
+
+# Compound index backing the group statistics and contingency queries
+GROUP_INDEX = [("inExperiment", 1), ("group", 1), ("admissionsQuiz", 1)]
+
+# Client shared by every object that is not given one explicitly
+_DEFAULT_CLIENT = None
+
+# Indexes already ensured in this process, per client, as
+# (collection full name, index keys)
+_ENSURED_INDEXES = weakref.WeakKeyDictionary()
+
+
+def get_default_client():
+    """Return the shared local MongoDB client, creating it on first use.
+
+    Returns
+    -------
+    pymongo.MongoClient
+    """
+    global _DEFAULT_CLIENT
+    if _DEFAULT_CLIENT is None:
+        _DEFAULT_CLIENT = MongoClient(host='localhost', port=27017, maxPoolSize=50)
+    return _DEFAULT_CLIENT
+
+
+def _forget_default_client():
+    """Drop the client inherited by a forked child, which must open its own."""
+    global _DEFAULT_CLIENT
+    _DEFAULT_CLIENT = None
+
+
+# MongoClient is not fork-safe, so forked processes (e.g. Dash background
+# callbacks) start without the parent's client
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_default_client)
+
+
+def current_epoch(collection):
+    """Return the current experiment epoch of a collection.
+
+    Parameters
+    ----------
+    collection : pymongo.collection.Collection
+
+    Returns
+    -------
+    int
+        0 if the collection has never been reset
+    """
+    meta = collection.database[META_COLLECTION].find_one({"_id": collection.name})
+    return meta["epoch"] if meta is not None else 0
+
+
+def ensure_indexes(collection, indexes):
+    """Create indexes on a collection, once per client and process.
+
+    Parameters
+    ----------
+    collection : pymongo.collection.Collection
+    indexes : list
+        Index key lists, e.g. ``[[("createdAt", 1)]]``
+    """
+    ensured = _ENSURED_INDEXES.setdefault(collection.database.client, set())
+    missing = [
+        keys for keys in indexes
+        if (collection.full_name, tuple(keys)) not in ensured
+    ]
+    if not missing:
+        return
+
+    collection.create_indexes([IndexModel(keys) for keys in missing])
+    ensured.update((collection.full_name, tuple(keys)) for keys in missing)
@@ -0,0 +1,86 @@
+"""
+Checks the closed-form statistics in business.py against statsmodels.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+from statsmodels.stats.contingency_tables import Table2x2
+from statsmodels.stats.power import GofChisquarePower
+
+from business import GraphBuilder, StatsBuilder
+
+
+class _TableRepo:
+    """Repository stand-in that serves a fixed contingency table."""
+
+    def __init__(self, table):
+        self.table = pd.DataFrame(table)
+
+    def get_contingency_table(self):
+        return self.table
+
+
+class _AgesRepo:
+    """Repository stand-in that serves fixed applicant ages."""
+
+    def __init__(self, ages):
+        self.ages = pd.Series(ages, name="years")
+
+    def get_ages(self):
+        return self.ages
+
+
+@pytest.mark.parametrize(
+    "table",
+    [
+        [[120, 80], [95, 105]],
+        [[0, 40], [25, 35]],
+        [[0, 0], [0, 0]],
+    ],
+    ids=["no-zero-cells", "zero-cell", "all-zero"],
+)
+def test_run_chi_square_matches_table2x2(table):
+    result = StatsBuilder(repo=_TableRepo(table)).run_chi_square()
+    expected = Table2x2(np.array(table)).test_nominal_association()
+
+    assert result.df == expected.df
+    np.testing.assert_allclose(result.statistic, expected.statistic, equal_nan=True)
+    np.testing.assert_allclose(result.pvalue, expected.pvalue, equal_nan=True)
+
+
+@pytest.mark.parametrize("effect_size", [0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8])
+def test_calculate_n_obs_matches_solve_power(effect_size):
+    group_size = GofChisquarePower().solve_power(
+        effect_size=effect_size, alpha=0.05, power=0.8
+    )
+
+    assert StatsBuilder.calculate_n_obs(effect_size) == math.ceil(group_size) * 2
+
+
+@pytest.mark.parametrize(
+    "ages",
+    [
+        np.repeat(np.arange(18, 66), 100),
+        np.arange(18, 38),
+        np.array([21, 22, 22, 64, 90]),
+        np.array([30]),
+    ],
+    ids=["uniform", "one-year-bins", "skewed", "single-age"],
+)
+def test_build_age_hist_keeps_each_age_in_one_bin(ages):
+    trace = GraphBuilder(repo=_AgesRepo(ages)).build_age_hist().data[0]
+    centres = np.asarray(trace.x, dtype=float)
+    lefts = centres - trace.width / 2
+    rights = centres + trace.width / 2
+
+    # Bars start and end between whole years
+    np.testing.assert_allclose(lefts % 1, 0.5)
+    np.testing.assert_allclose(rights % 1, 0.5)
+
+    # Each bar counts exactly the ages it spans
+    for left, right, count in zip(lefts, rights, trace.y):
+        assert count == np.count_nonzero((ages > left) & (ages < right))
+    assert sum(trace.y) == len(ages)